@@ -8,15 +8,40 @@ Created with the assistance of Claude by Anthropic (claude.ai)
 """
 
 import urllib.request
+import http.client
 import ssl
-import csv
 import time
+import textwrap
 import json
 import os
+import re
 import socket
+import subprocess
+import asyncio
+import queue
+import threading
+import collections
+import statistics
 import concurrent.futures
 from datetime import datetime
 
+# Optional fast JSON parser for the per-second decode; stdlib remains the
+# fallback so the script still runs with no external dependencies
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    try:
+        from ujson import loads as json_loads
+    except ImportError:
+        json_loads = json.loads
+
+# Optional mDNS discovery; falls back to the scan-based steps without it
+try:
+    from zeroconf import Zeroconf, ServiceBrowser
+    HAVE_ZEROCONF = True
+except ImportError:
+    HAVE_ZEROCONF = False
+
 # ============== CONFIGURATION ==============
 # Leave empty for auto-discovery, or set manually:
 WICAN_IP = ""  # e.g., "192.168.8.102"
@@ -33,9 +58,23 @@ SCAN_SUBNETS = []  # e.g., ["192.168.1", "192.168.8"]
 # Port WiCAN uses
 WICAN_PORT = 80
 
+# Discovery tuning; override via environment on slow or loaded networks
+SCAN_CONCURRENCY = int(os.environ.get("WICAN_SCAN_WORKERS", 256))
+SCAN_TIMEOUT = float(os.environ.get("WICAN_SCAN_TIMEOUT", 0.3))
+COMMON_WORKERS = int(os.environ.get("WICAN_COMMON_WORKERS", 16))
+
 OUTPUT_FILE = f"wican_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
 INTERVAL = 1  # seconds
 
+# Rows are buffered and written in batches; at most this many rows (or
+# this many seconds of data) can be lost on a hard crash
+BATCH_SIZE = 10
+FLUSH_INTERVAL = 10.0  # seconds
+
+# Last-known-good IP is remembered here between runs
+CACHE_FILE = os.path.expanduser("~/.wican_logger_cache.json")
+CACHE_TTL = 24 * 3600  # re-discover after a day even if the cache looks fine
+
 # Display mode: "all", "compact", or "key"
 DISPLAY_MODE = "all"
 # ===========================================
@@ -45,6 +84,23 @@ ssl_context = ssl.create_default_context()
 ssl_context.check_hostname = False
 ssl_context.verify_mode = ssl.CERT_NONE
 
+class NoDelayHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that disables Nagle's algorithm on connect.
+
+    Our requests are tiny one-shots; without TCP_NODELAY the kernel can
+    hold them back up to 40 ms waiting to coalesce more data.
+    """
+    def connect(self):
+        super().connect()
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+class NoDelayHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(NoDelayHTTPConnection, req)
+
+opener = urllib.request.build_opener(
+    NoDelayHTTPHandler, urllib.request.HTTPSHandler(context=ssl_context))
+
 working_url = None
 
 def get_local_ip():
@@ -78,27 +134,89 @@ def check_wican(ip, timeout=1):
     url = f"http://{ip}/autopid_data"
     try:
         req = urllib.request.Request(url)
-        with urllib.request.urlopen(req, timeout=timeout) as response:
-            data = response.read().decode('utf-8')
+        with opener.open(req, timeout=timeout) as response:
+            data = response.read()
             # Verify it's JSON (WiCAN response)
-            json.loads(data)
+            json_loads(data)
             return ip
     except:
         return None
 
+async def scan_alive(ips, port=WICAN_PORT, timeout=SCAN_TIMEOUT, concurrency=SCAN_CONCURRENCY):
+    """Find hosts with something listening on ip:port via bare TCP connects.
+
+    Far cheaper than an HTTP probe: most IPs in a subnet sweep are dead
+    and just time out, so don't pay urllib's request machinery for them.
+    One event loop fires all probes at once (no thread pool, no GIL
+    contention), so a /24 sweep completes in roughly a single timeout.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def probe(ip):
+        async with sem:
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection(ip, port), timeout)
+                writer.close()
+                return ip
+            except:
+                return None
+
+    results = await asyncio.gather(*[probe(ip) for ip in ips])
+    return [ip for ip in results if ip]
+
+def live_hosts(subnet):
+    """IPs on the subnet already present in the OS ARP cache.
+
+    An ARP entry means the host was recently alive on the L2 segment, so
+    these are much better scan candidates than 255 blind probes. Reads
+    /proc/net/arp on Linux, falls back to parsing `arp -a` elsewhere,
+    and returns [] when neither source works.
+    """
+    prefix = subnet + '.'
+    try:
+        hosts = []
+        with open('/proc/net/arp') as f:
+            next(f)  # header line
+            for line in f:
+                fields = line.split()
+                # fields: IP, HW type, flags, ...; flags 0x0 = incomplete entry
+                if len(fields) >= 3 and fields[0].startswith(prefix) and fields[2] != '0x0':
+                    hosts.append(fields[0])
+        return hosts
+    except OSError:
+        pass
+    try:
+        # mac/Windows print entries like "? (192.168.1.5) at aa:bb:..."
+        out = subprocess.run(['arp', '-a'], capture_output=True, text=True,
+                             timeout=5).stdout
+        return [ip for ip in re.findall(r'\((\d+\.\d+\.\d+\.\d+)\)', out)
+                if ip.startswith(prefix)]
+    except Exception:
+        return []
+
+def probe_and_verify(ips):
+    """TCP-filter a list of IPs, then HTTP-verify the survivors"""
+    alive = asyncio.run(scan_alive(ips))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=50) as executor:
+        results = executor.map(lambda ip: check_wican(ip, timeout=0.5), alive)
+        return [r for r in results if r]
+
 def scan_subnet(subnet, start=1, end=255):
     """Scan a subnet for WiCAN devices"""
     print(f"  Scanning {subnet}.{start}-{end}...", end=" ", flush=True)
-    
-    found = []
+
     ips = [f"{subnet}.{i}" for i in range(start, end + 1)]
-    
-    # Use thread pool for parallel scanning
-    with concurrent.futures.ThreadPoolExecutor(max_workers=50) as executor:
-        results = executor.map(lambda ip: check_wican(ip, timeout=0.5), ips)
-        for result in results:
-            if result:
-                found.append(result)
+
+    # Known-alive hosts from the ARP cache first; typically a handful of
+    # probes instead of the whole range
+    in_range = set(ips)
+    arp_ips = [ip for ip in live_hosts(subnet) if ip in in_range]
+
+    found = probe_and_verify(arp_ips) if arp_ips else []
+    if not found:
+        # ARP cache was empty or didn't pan out; do the full sweep
+        found = probe_and_verify(ips)
     
     if found:
         print(f"Found: {found}")
@@ -107,27 +225,112 @@ def scan_subnet(subnet, start=1, end=255):
     
     return found
 
+def load_cached_ip():
+    """Return the last-known-good IP if the cache file is fresh enough"""
+    try:
+        with open(CACHE_FILE) as f:
+            cache = json.load(f)
+        if time.time() - cache.get('timestamp', 0) < CACHE_TTL:
+            return cache.get('ip')
+    except:
+        pass
+    return None
+
+def save_cached_ip(ip):
+    """Remember a working IP so the next startup can skip discovery"""
+    try:
+        with open(CACHE_FILE, 'w') as f:
+            json.dump({'ip': ip, 'timestamp': time.time()}, f)
+    except:
+        pass
+
+async def resolve_hostnames(hostnames):
+    """Resolve hostnames in parallel (a failing mDNS lookup can block for seconds)"""
+    loop = asyncio.get_running_loop()
+
+    async def resolve(hostname):
+        try:
+            return await loop.run_in_executor(None, socket.gethostbyname, hostname)
+        except:
+            return None
+
+    return await asyncio.gather(*[resolve(h) for h in hostnames])
+
+async def check_wican_many(ips):
+    """Probe a list of IPs for WiCAN in parallel"""
+    loop = asyncio.get_running_loop()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=COMMON_WORKERS) as executor:
+        return await asyncio.gather(
+            *[loop.run_in_executor(executor, check_wican, ip) for ip in ips])
+
+def discover_mdns(browse_time=1.0):
+    """Look for WiCAN via mDNS service discovery.
+
+    A single multicast round trip instead of sweeping a subnet; the WiCAN
+    advertises _http._tcp on the local link. Returns None when zeroconf
+    isn't installed or nothing matching answers.
+    """
+    if not HAVE_ZEROCONF:
+        return None
+
+    found = []
+
+    class _Listener:
+        def add_service(self, zc, type_, name):
+            if 'wican' not in name.lower():
+                return
+            info = zc.get_service_info(type_, name)
+            if info and info.addresses:
+                found.append(socket.inet_ntoa(info.addresses[0]))
+
+        def update_service(self, zc, type_, name):
+            pass
+
+        def remove_service(self, zc, type_, name):
+            pass
+
+    zc = Zeroconf()
+    try:
+        ServiceBrowser(zc, "_http._tcp.local.", _Listener())
+        time.sleep(browse_time)
+    finally:
+        zc.close()
+
+    for ip in found:
+        if check_wican(ip):
+            return ip
+    return None
+
 def discover_wican():
     """Auto-discover WiCAN on the network"""
     print("=" * 50)
     print("WiCAN Auto-Discovery")
     print("=" * 50)
-    
-    # 1. Try hostnames first (fastest)
-    print("\n[1/3] Trying known hostnames...")
-    for hostname in WICAN_HOSTNAMES:
-        print(f"  Trying {hostname}...", end=" ", flush=True)
-        try:
-            ip = socket.gethostbyname(hostname)
-            if check_wican(ip):
-                print(f"Found! ({ip})")
-                return ip
-            print("no response")
-        except:
-            print("not found")
-    
-    # 2. Try common WiCAN IPs
-    print("\n[2/3] Trying common WiCAN IPs...")
+
+    # 1. mDNS first: one multicast round trip when zeroconf is available
+    print("\n[1/4] Browsing mDNS (_http._tcp)...")
+    if HAVE_ZEROCONF:
+        ip = discover_mdns()
+        if ip:
+            print(f"  Found WiCAN at: {ip}")
+            return ip
+        print("  No mDNS answer")
+    else:
+        print("  Skipped (zeroconf not installed)")
+
+    # 2. Resolve all hostnames at once (wall clock = slowest lookup, not the sum)
+    print("\n[2/4] Trying known hostnames...")
+    resolved = asyncio.run(resolve_hostnames(WICAN_HOSTNAMES))
+    candidates = []
+    for hostname, ip in zip(WICAN_HOSTNAMES, resolved):
+        if ip:
+            print(f"  {hostname} -> {ip}")
+            candidates.append(ip)
+        else:
+            print(f"  {hostname}... not found")
+
+    # 3. Probe resolved candidates + common WiCAN IPs concurrently
+    print("\n[3/4] Trying common WiCAN IPs...")
     common_ips = [
         "192.168.8.102",  # Default WiCAN AP mode
         "192.168.4.1",    # ESP32 AP default
@@ -136,17 +339,17 @@ def discover_wican():
         "192.168.0.100",
         "192.168.0.102",
     ]
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        results = list(executor.map(check_wican, common_ips))
-        for ip, result in zip(common_ips, results):
-            if result:
-                print(f"  Found WiCAN at: {ip}")
-                return ip
+
+    ips = candidates + [ip for ip in common_ips if ip not in candidates]
+    results = asyncio.run(check_wican_many(ips))
+    for ip, result in zip(ips, results):
+        if result:
+            print(f"  Found WiCAN at: {ip}")
+            return ip
     print("  Not found in common IPs")
     
-    # 3. Full subnet scan
-    print("\n[3/3] Scanning local network...")
+    # 4. Full subnet scan
+    print("\n[4/4] Scanning local network...")
     subnets = get_subnets_to_scan()
     
     for subnet in subnets:
@@ -156,76 +359,165 @@ def discover_wican():
     
     return None
 
+# Rolling window of successful fetch latencies drives the adaptive timeout
+latencies = collections.deque(maxlen=100)
+
+def adaptive_timeout():
+    """Request timeout derived from observed latencies: p99 + 3 sigma.
+
+    A fixed 5 s timeout means one lost packet stalls the logger for five
+    ticks; on a fast LAN the real round trip is milliseconds. Fall back
+    to 5 s until we have enough samples to estimate.
+    """
+    if len(latencies) < 20:
+        return 5
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    return max(0.2, p99 + 3 * statistics.pstdev(latencies))
+
+wican_conn = None
+
 def fetch_data():
-    """Fetch data from WiCAN endpoint"""
-    global working_url
-    
+    """Fetch data from WiCAN endpoint over a persistent keep-alive connection"""
+    global wican_conn
+
     if not working_url:
         return None
-    
+
     try:
-        req = urllib.request.Request(working_url)
-        ctx = ssl_context if working_url.startswith("https") else None
-        with urllib.request.urlopen(req, timeout=5, context=ctx) as response:
-            data = response.read().decode('utf-8')
-            return json.loads(data)
+        # Reuse one connection across ticks instead of paying a TCP
+        # handshake every second
+        if wican_conn is None:
+            host = working_url.split('/')[2]
+            wican_conn = NoDelayHTTPConnection(host, timeout=adaptive_timeout())
+        elif wican_conn.sock:
+            wican_conn.sock.settimeout(adaptive_timeout())
+
+        start = time.monotonic()
+        wican_conn.request("GET", "/autopid_data")
+        response = wican_conn.getresponse()
+        # Parsers all take bytes directly, so skip the decode allocation
+        result = json_loads(response.read())
+        latencies.append(time.monotonic() - start)
+        return result
     except Exception:
+        # Device may have dropped the keep-alive; reconnect on the next tick
+        if wican_conn is not None:
+            wican_conn.close()
+            wican_conn = None
         return None
 
-def rewrite_csv(filepath, fieldnames, all_rows):
-    """Rewrite the entire CSV with updated fieldnames"""
-    with open(filepath, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(all_rows)
+def _q(v):
+    """Minimal CSV field quoter (None becomes an empty cell)"""
+    if v is None:
+        return ''
+    s = str(v)
+    if '"' in s:
+        return '"' + s.replace('"', '""') + '"'
+    if ',' in s or '\n' in s or '\r' in s:
+        return '"' + s + '"'
+    return s
+
+def compile_row_writer(fieldnames):
+    """Generate a row serializer specialized to the current schema.
+
+    DictWriter re-does a dict lookup, escape test, and quoting decision
+    for every field of every row. Schemas only change on the rare
+    new-field event, so bake the field order into a generated function
+    whose body is a single join over pre-bound lookups.
+    """
+    gets = ', '.join(f"_q(r.get({k!r}))" for k in fieldnames)
+    src = f"def _row(r):\n    return ','.join(({gets},)) + '\\r\\n'"
+    ns = {'_q': _q}
+    exec(src, ns)
+    return ns['_row']
+
+def write_schema(filepath, fieldnames):
+    """Save the current field list next to the CSV (OUTPUT_FILE + '.schema').
+
+    New fields can appear mid-session; instead of rewriting every historical
+    row, we just keep appending and record the full column list here so
+    readers can reconstruct the final header.
+    """
+    with open(filepath + '.schema', 'w') as f:
+        json.dump(fieldnames, f, indent=2)
+
+# key -> float formatter, chosen once per key (same idea as _group_cache)
+_fmt_cache = {}
+
+def _pick_formatter(key):
+    """Choose the float formatter for a key based on its name"""
+    if 'Temp' in key or '_C' in key:
+        return lambda v: f"{v:.0f}°"
+    elif 'pct' in key or 'SOC' in key or 'SOH' in key:
+        return lambda v: f"{v:.1f}%"
+    elif 'Voltage' in key or '_V' in key:
+        return lambda v: f"{v:.2f}V"
+    elif 'Current' in key or '_A' in key:
+        return lambda v: f"{v:.1f}A"
+    elif 'Power' in key or '_kW' in key:
+        return lambda v: f"{v:.1f}kW"
+    elif 'psi' in key:
+        return lambda v: f"{v:.1f}"
+    else:
+        return lambda v: f"{v:.2f}"
 
 def format_value(key, value):
     """Format value for display based on key name"""
     if value is None:
         return "---"
     if isinstance(value, float):
-        if 'Temp' in key or '_C' in key:
-            return f"{value:.0f}°"
-        elif 'pct' in key or 'SOC' in key or 'SOH' in key:
-            return f"{value:.1f}%"
-        elif 'Voltage' in key or '_V' in key:
-            return f"{value:.2f}V"
-        elif 'Current' in key or '_A' in key:
-            return f"{value:.1f}A"
-        elif 'Power' in key or '_kW' in key:
-            return f"{value:.1f}kW"
-        elif 'psi' in key:
-            return f"{value:.1f}"
-        else:
-            return f"{value:.2f}"
+        fmt = _fmt_cache.get(key)
+        if fmt is None:
+            fmt = _pick_formatter(key)
+            _fmt_cache[key] = fmt
+        return fmt(value)
     return str(value)
 
+# Key names are stable across a session, so classify/shorten each one once
+# instead of re-running the substring tests every tick
+_group_cache = {}
+_short_key_cache = {}
+
+def _classify(key):
+    """Assign a display group to a parameter name"""
+    if key.startswith('Cell_') and '_V' in key:
+        return 'Cells'
+    elif key.startswith('VMCU'):
+        return 'VMCU'
+    elif key.startswith('BMS'):
+        return 'BMS'
+    elif 'Temp' in key or '_C' in key:
+        return 'Temps'
+    elif 'Gear' in key or 'Brake' in key or 'Regen' in key:
+        return 'Drive'
+    elif 'psi' in key:
+        return 'TPMS'
+    else:
+        return 'Other'
+
+def _shorten(key):
+    """Abbreviate a parameter name for compact display"""
+    short_key = key.replace('_pct', '%').replace('_V', 'V').replace('_A', 'A')
+    short_key = short_key.replace('_kW', 'kW').replace('_C', '°').replace('_km', 'km')
+    short_key = short_key.replace('Batt_', '').replace('Cell_V_', 'Cell')
+    return short_key
+
 def print_all_data(data, row_count, timestamp):
     """Print all data in a formatted way"""
     time_str = timestamp[11:19]
-    
+
     print(f"\n{'='*80}")
     print(f"[{time_str}] Row {row_count} | {len(data)} parameters")
     print(f"{'='*80}")
-    
+
     # Group parameters by prefix
     groups = {}
     for key, value in sorted(data.items()):
-        if key.startswith('Cell_') and '_V' in key:
-            group = 'Cells'
-        elif key.startswith('VMCU'):
-            group = 'VMCU'
-        elif key.startswith('BMS'):
-            group = 'BMS'
-        elif 'Temp' in key or '_C' in key:
-            group = 'Temps'
-        elif 'Gear' in key or 'Brake' in key or 'Regen' in key:
-            group = 'Drive'
-        elif 'psi' in key:
-            group = 'TPMS'
-        else:
-            group = 'Other'
-        
+        group = _group_cache.get(key)
+        if group is None:
+            group = _classify(key)
+            _group_cache[key] = group
+
         if group not in groups:
             groups[group] = []
         groups[group].append((key, value))
@@ -244,20 +536,17 @@ def print_all_data(data, row_count, timestamp):
                 print(f"  {cell_nums}: {' '.join(row_cells)}")
         else:
             print(f"\n[{group_name}]")
-            line = "  "
+            parts = []
             for key, value in items:
-                short_key = key.replace('_pct', '%').replace('_V', 'V').replace('_A', 'A')
-                short_key = short_key.replace('_kW', 'kW').replace('_C', '°').replace('_km', 'km')
-                short_key = short_key.replace('Batt_', '').replace('Cell_V_', 'Cell')
-                
-                formatted = f"{short_key}:{format_value(key, value)}"
-                
-                if len(line) + len(formatted) > 78:
-                    print(line)
-                    line = "  "
-                line += formatted + " "
-            if line.strip():
-                print(line)
+                short_key = _short_key_cache.get(key)
+                if short_key is None:
+                    short_key = _shorten(key)
+                    _short_key_cache[key] = short_key
+                parts.append(f"{short_key}:{format_value(key, value)}")
+
+            # One join + one print per group instead of growing a string
+            # token by token with manual line-length bookkeeping
+            print('\n'.join('  ' + l for l in textwrap.wrap(' '.join(parts), 78)))
 
 def print_compact_data(data, row_count, timestamp):
     """Print compact single-line output"""
@@ -279,6 +568,41 @@ def print_compact_data(data, row_count, timestamp):
     
     print(f"[{time_str}] #{row_count} | SOC:{soc} | {voltage} | {current} | {power} | {len(data)} params")
 
+_ts_cache = (0, "")
+
+def make_timestamp():
+    """ISO-8601 local timestamp via the C-level strftime path.
+
+    Cheaper than datetime.now().isoformat(); the second-resolution prefix
+    is cached so sub-second polling rates only pay for the microsecond
+    suffix.
+    """
+    global _ts_cache
+    now = time.time()
+    sec = int(now)
+    cached_sec, prefix = _ts_cache
+    if sec != cached_sec:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(sec))
+        _ts_cache = (sec, prefix)
+    return f"{prefix}.{int((now - sec) * 1e6):06d}"
+
+# Display frames are rendered off the logging thread so a slow terminal
+# (piped output, laggy SSH session) can't stall the fetch/CSV loop
+print_q = queue.Queue(maxsize=4)
+
+def printer_worker():
+    """Drain the print queue and render frames"""
+    while True:
+        data, row_count, timestamp = print_q.get()
+        if DISPLAY_MODE == "all":
+            print_all_data(data, row_count, timestamp)
+        elif DISPLAY_MODE == "compact":
+            print_compact_data(data, row_count, timestamp)
+        else:
+            soc = data.get('SOC_pct', data.get('SOC', 'N/A'))
+            print(f"[{timestamp[11:19]}] Row {row_count} | SOC: {soc}% | {len(data)} params")
+        print_q.task_done()
+
 def main():
     global working_url
     
@@ -291,7 +615,19 @@ def main():
         wican_ip = WICAN_IP
         print(f"Using configured IP: {wican_ip}")
     else:
-        wican_ip = discover_wican()
+        # The IP rarely changes between runs; try last-known-good first
+        wican_ip = None
+        cached_ip = load_cached_ip()
+        if cached_ip:
+            print(f"Trying cached IP: {cached_ip}...", end=" ", flush=True)
+            if check_wican(cached_ip, timeout=1):
+                print("Connected!")
+                wican_ip = cached_ip
+            else:
+                print("no response")
+
+        if not wican_ip:
+            wican_ip = discover_wican()
         if not wican_ip:
             print("\n" + "!"*50)
             print("WARNING: Could not find WiCAN on network!")
@@ -327,6 +663,7 @@ def main():
                     print("no response.")
                     print("  Device not found at that address. Try again or press 'q' to quit.")
     
+    save_cached_ip(wican_ip)
     working_url = f"http://{wican_ip}/autopid_data"
     
     print(f"\n{'='*50}")
@@ -339,17 +676,24 @@ def main():
     row_count = 0
     error_count = 0
     fieldnames = ["timestamp"]
-    all_rows = []
-    
+    batch = []
+    last_flush = time.monotonic()
+
+    # Keep one buffered file handle + serializer alive for the whole session
+    # instead of re-opening the file every second
+    csvfile = open(OUTPUT_FILE, 'w', newline='', buffering=65536)
+    row_fn = compile_row_writer(fieldnames)
+
+    threading.Thread(target=printer_worker, daemon=True).start()
+    next_tick = time.monotonic()
+
     try:
         while True:
-            start_time = time.time()
-            
             data = fetch_data()
             
             if data:
                 error_count = 0
-                timestamp = datetime.now().isoformat()
+                timestamp = make_timestamp()
                 
                 row = {"timestamp": timestamp}
                 row.update(data)
@@ -361,40 +705,55 @@ def main():
                 if new_keys:
                     sorted_new_keys = sorted(new_keys)
                     fieldnames.extend(sorted_new_keys)
-                    
+
                     if row_count == 0:
                         print(f"Initial fields: {len(fieldnames)} parameters\n")
                     else:
                         print(f"\n  [+] New fields: {sorted_new_keys}")
-                        rewrite_csv(OUTPUT_FILE, fieldnames, all_rows)
-                
-                all_rows.append(row)
-                
-                with open(OUTPUT_FILE, 'a', newline='') as csvfile:
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    if row_count == 0 or csvfile.tell() == 0:
-                        writer.writeheader()
-                    writer.writerow(row)
-                
+                    # Later rows just grow extra columns; the schema file
+                    # tells readers what the full header is
+                    write_schema(OUTPUT_FILE, fieldnames)
+                    row_fn = compile_row_writer(fieldnames)
+
+                if row_count == 0:
+                    csvfile.write(','.join(map(_q, fieldnames)) + '\r\n')
+                batch.append(row)
                 row_count += 1
+
+                # One write + flush per batch instead of a write per tick
+                now = time.monotonic()
+                if len(batch) >= BATCH_SIZE or now - last_flush > FLUSH_INTERVAL:
+                    csvfile.write(''.join(map(row_fn, batch)))
+                    batch.clear()
+                    csvfile.flush()
+                    os.fsync(csvfile.fileno())
+                    last_flush = now
                 
-                if DISPLAY_MODE == "all":
-                    print_all_data(data, row_count, timestamp)
-                elif DISPLAY_MODE == "compact":
-                    print_compact_data(data, row_count, timestamp)
-                else:
-                    soc = data.get('SOC_pct', data.get('SOC', 'N/A'))
-                    print(f"[{timestamp[11:19]}] Row {row_count} | SOC: {soc}% | {len(data)} params")
+                try:
+                    print_q.put_nowait((data, row_count, timestamp))
+                except queue.Full:
+                    pass  # terminal can't keep up; drop the frame, keep logging
             else:
                 error_count += 1
                 if error_count == 1:
                     print(f"Connection lost, reconnecting...")
+                    # Don't sit on buffered rows while the device is down
+                    if batch:
+                        csvfile.write(''.join(map(row_fn, batch)))
+                        batch.clear()
+                        csvfile.flush()
+                        os.fsync(csvfile.fileno())
+                        last_flush = time.monotonic()
                 elif error_count % 10 == 0:
                     print(f"Still trying... (attempt {error_count})")
             
-            elapsed = time.time() - start_time
-            sleep_time = max(0, INTERVAL - elapsed)
-            time.sleep(sleep_time)
+            # Schedule against the monotonic clock so ticks don't drift and
+            # NTP/DST jumps of the wall clock can't confuse the loop
+            next_tick += INTERVAL
+            now = time.monotonic()
+            if next_tick < now:
+                next_tick = now  # fell behind (slow fetch); don't burst to catch up
+            time.sleep(max(0, next_tick - now))
             
     except KeyboardInterrupt:
         print(f"\n\n{'='*50}")
@@ -406,6 +765,10 @@ def main():
             print(f"\nAll fields captured:")
             for i, field in enumerate(fieldnames):
                 print(f"  {i+1:3d}. {field}")
+    finally:
+        if batch:
+            csvfile.write(''.join(map(row_fn, batch)))
+        csvfile.close()
 
 if __name__ == "__main__":
     main()